@@ -0,0 +1,245 @@
+# app/crud/budget.py
+from typing import Optional, List, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, literal, Date
+
+from app import models, schemas
+from app.database import upsert_insert
+
+BUDGET_PERIODS = ("month", "week", "custom")
+
+
+def period_bounds(
+    period: str,
+    moment: date,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[Optional[date], Optional[date]]:
+    """Начало и конец периода бюджета, в который попадает дата moment"""
+    if period == "month":
+        start = moment.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+
+    if period == "week":
+        start = moment - timedelta(days=moment.weekday())
+        return start, start + timedelta(days=6)
+
+    # custom: один фиксированный период
+    if start_date and end_date and start_date <= moment <= end_date:
+        return start_date, end_date
+    return None, None
+
+
+class BudgetCRUD:
+    @staticmethod
+    def get_budget(db: Session, budget_id: int) -> Optional[models.Budget]:
+        """Получить бюджет по ID"""
+        return db.query(models.Budget).filter(
+            models.Budget.id == budget_id
+        ).first()
+
+    @staticmethod
+    def get_budgets(db: Session, skip: int = 0, limit: int = 100) -> List[models.Budget]:
+        """Получить список бюджетов"""
+        return db.query(models.Budget).order_by(
+            models.Budget.id
+        ).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def create_budget(db: Session, budget: schemas.BudgetCreate) -> models.Budget:
+        """Создать бюджет и посчитать расходы, уже попавшие в его периоды"""
+        db_budget = models.Budget(**budget.dict())
+
+        db.add(db_budget)
+        db.flush()
+        BudgetCRUD.rebuild_counters(db, budget_ids=[db_budget.id])
+        db.commit()
+        db.refresh(db_budget)
+
+        return db_budget
+
+    @staticmethod
+    def update_budget(
+        db: Session,
+        db_budget: models.Budget,
+        budget_update: schemas.BudgetUpdate
+    ) -> models.Budget:
+        """Обновить бюджет; при смене категории или периода счетчики пересчитываются"""
+        update_data = budget_update.dict(exclude_unset=True)
+
+        for field, value in update_data.items():
+            setattr(db_budget, field, value)
+
+        if update_data.keys() & {"category_id", "period", "start_date", "end_date"}:
+            db.flush()
+            BudgetCRUD.rebuild_counters(db, budget_ids=[db_budget.id])
+
+        db.commit()
+        db.refresh(db_budget)
+
+        return db_budget
+
+    @staticmethod
+    def delete_budget(db: Session, db_budget: models.Budget) -> None:
+        """Удалить бюджет вместе со счетчиками"""
+        db.query(models.BudgetSpend).filter(
+            models.BudgetSpend.budget_id == db_budget.id
+        ).delete(synchronize_session=False)
+        db.delete(db_budget)
+        db.commit()
+
+    @staticmethod
+    def apply_transaction(
+        db: Session,
+        category_id: Optional[int],
+        type: Optional[str],
+        amount: float,
+        created_at: datetime,
+        sign: int = 1
+    ) -> bool:
+        """
+        Учесть транзакцию в счетчиках бюджетов ее категории (sign=-1 — откатить).
+
+        Не коммитит: вызывается внутри транзакции создания/изменения/удаления.
+        Возвращает True, если после изменения какой-либо бюджет превышен.
+        """
+        if not category_id or type != "expense":
+            return False
+
+        budgets = db.query(
+            models.Budget.id,
+            models.Budget.amount,
+            models.Budget.period,
+            models.Budget.start_date,
+            models.Budget.end_date
+        ).filter(models.Budget.category_id == category_id).all()
+
+        over_budget = False
+        moment = created_at.date()
+
+        for budget_id, limit, period, start_date, end_date in budgets:
+            period_start, _ = period_bounds(period, moment, start_date, end_date)
+            if period_start is None:
+                continue
+
+            key = and_(
+                models.BudgetSpend.budget_id == budget_id,
+                models.BudgetSpend.period_start == period_start
+            )
+            # Атомарный upsert: строка счетчика создается при первом расходе,
+            # и параллельные первые расходы периода не конфликтуют по ключу
+            insert = upsert_insert(db, models.BudgetSpend).values(
+                budget_id=budget_id,
+                period_start=period_start,
+                spent=sign * amount
+            )
+            db.execute(insert.on_conflict_do_update(
+                index_elements=["budget_id", "period_start"],
+                set_={"spent": models.BudgetSpend.spent + insert.excluded.spent}
+            ))
+
+            if sign > 0:
+                spent = db.query(models.BudgetSpend.spent).filter(key).scalar() or 0
+                over_budget = over_budget or spent > limit
+
+        return over_budget
+
+    @staticmethod
+    def get_status(db: Session, today: Optional[date] = None) -> List[schemas.BudgetStatus]:
+        """Текущее использование всех бюджетов одним запросом"""
+        today = today or date.today()
+        month_start, _ = period_bounds("month", today)
+        week_start, _ = period_bounds("week", today)
+
+        current_start = case(
+            (models.Budget.period == "month", literal(month_start, Date)),
+            (models.Budget.period == "week", literal(week_start, Date)),
+            else_=models.Budget.start_date
+        )
+
+        rows = db.query(
+            models.Budget,
+            func.coalesce(models.BudgetSpend.spent, 0)
+        ).outerjoin(
+            models.BudgetSpend,
+            and_(
+                models.BudgetSpend.budget_id == models.Budget.id,
+                models.BudgetSpend.period_start == current_start
+            )
+        ).order_by(models.Budget.id).all()
+
+        statuses = []
+        for budget, spent in rows:
+            if budget.period == "custom":
+                period_start, period_end = budget.start_date, budget.end_date
+            else:
+                period_start, period_end = period_bounds(budget.period, today)
+
+            statuses.append(schemas.BudgetStatus(
+                budget_id=budget.id,
+                category_id=budget.category_id,
+                period=budget.period,
+                period_start=period_start,
+                period_end=period_end,
+                amount=budget.amount,
+                spent=float(spent),
+                remaining=float(budget.amount - spent),
+                utilization=float(spent / budget.amount) if budget.amount else 0,
+                over_budget=spent > budget.amount
+            ))
+
+        return statuses
+
+    @staticmethod
+    def rebuild_counters(db: Session, budget_ids: Optional[List[int]] = None) -> int:
+        """
+        Пересчитать счетчики расходов с нуля (например, после массового импорта).
+
+        Транзакции читаются потоком один раз для всех бюджетов.
+        Не коммитит. Возвращает количество созданных счетчиков.
+        """
+        budget_query = db.query(models.Budget)
+        spend_query = db.query(models.BudgetSpend)
+        if budget_ids is not None:
+            budget_query = budget_query.filter(models.Budget.id.in_(budget_ids))
+            spend_query = spend_query.filter(models.BudgetSpend.budget_id.in_(budget_ids))
+
+        spend_query.delete(synchronize_session=False)
+
+        budgets_by_category = defaultdict(list)
+        for budget in budget_query.all():
+            budgets_by_category[budget.category_id].append(budget)
+
+        if not budgets_by_category:
+            return 0
+
+        rows = db.query(
+            models.Transaction.category_id,
+            models.Transaction.amount,
+            models.Transaction.created_at
+        ).filter(
+            and_(
+                models.Transaction.type == "expense",
+                models.Transaction.category_id.in_(list(budgets_by_category))
+            )
+        ).yield_per(1000)
+
+        totals = defaultdict(float)
+        for category_id, amount, created_at in rows:
+            for budget in budgets_by_category[category_id]:
+                period_start, _ = period_bounds(
+                    budget.period, created_at.date(), budget.start_date, budget.end_date
+                )
+                if period_start is not None:
+                    totals[(budget.id, period_start)] += amount
+
+        db.add_all([
+            models.BudgetSpend(budget_id=budget_id, period_start=period_start, spent=spent)
+            for (budget_id, period_start), spent in totals.items()
+        ])
+        db.flush()
+
+        return len(totals)
@@ -0,0 +1,232 @@
+# app/crud/category_stats.py
+"""
+Потоковая статистика сумм транзакций по категориям.
+
+Учитываются только расходы. Для каждой категории хранятся count/mean/m2 (алгоритм Уэлфорда) и
+логарифмический квантильный скетч (как в DDSketch). Обе структуры
+обновляются за O(1) при записи и обратимы при удалении, поэтому
+оценка аномальности новой транзакции не требует чтения истории.
+"""
+import json
+import math
+import os
+from typing import Optional, List, Tuple
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import upsert_insert
+
+# Минимум транзакций в категории, после которого считается anomaly_score
+ANOMALY_MIN_COUNT = int(os.getenv("ANOMALY_MIN_COUNT", "5"))
+# Порог, начиная с которого транзакция попадает в список выбросов
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "3.0"))
+# Нижняя граница стандартного отклонения относительно среднего,
+# чтобы категория с одинаковыми суммами не давала бесконечный score
+MIN_RELATIVE_STD = 0.1
+
+# Относительная точность квантилей скетча
+SKETCH_ACCURACY = 0.05
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def welford_add(count: int, mean: float, m2: float, value: float) -> Tuple[int, float, float]:
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def welford_remove(count: int, mean: float, m2: float, value: float) -> Tuple[int, float, float]:
+    if count <= 1:
+        return 0, 0.0, 0.0
+    new_mean = (count * mean - value) / (count - 1)
+    m2 -= (value - new_mean) * (value - mean)
+    return count - 1, new_mean, max(m2, 0.0)
+
+
+def _bucket(value: float) -> int:
+    # Неположительные суммы складываются в нулевую корзину
+    if value <= 0:
+        return 0
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def _bucket_value(index: int) -> float:
+    if index == 0:
+        return 0.0
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+
+def sketch_update(sketch: dict, value: float, sign: int = 1) -> dict:
+    key = str(_bucket(value))
+    sketch[key] = sketch.get(key, 0) + sign
+    if sketch[key] <= 0:
+        del sketch[key]
+    return sketch
+
+
+def sketch_quantile(sketch: dict, quantile: float) -> Optional[float]:
+    """Приближенный квантиль (относительная ошибка не больше SKETCH_ACCURACY)"""
+    total = sum(sketch.values())
+    if not total:
+        return None
+    rank = quantile * (total - 1)
+    seen = 0
+    for index in sorted(int(key) for key in sketch):
+        seen += sketch[str(index)]
+        if seen > rank:
+            return _bucket_value(index)
+    return None
+
+
+def anomaly_score(stats: models.CategoryStats, value: float) -> Optional[float]:
+    """z-score значения относительно текущей статистики категории"""
+    if stats is None or stats.count < ANOMALY_MIN_COUNT:
+        return None
+    std = math.sqrt(stats.m2 / (stats.count - 1))
+    std = max(std, abs(stats.mean) * MIN_RELATIVE_STD, 1e-9)
+    return round((value - stats.mean) / std, 2)
+
+
+class CategoryStatsCRUD:
+    @staticmethod
+    def apply_transaction(
+        db: Session,
+        transaction: models.Transaction,
+        sign: int = 1
+    ) -> Optional[float]:
+        """
+        Учесть сумму расхода в статистике категории (sign=-1 — откатить).
+
+        При добавлении возвращает anomaly_score относительно статистики
+        до этой транзакции и записывает выброс в transaction_anomalies.
+        Не коммитит.
+        """
+        if sign < 0 and transaction.id is not None:
+            db.query(models.TransactionAnomaly).filter(
+                models.TransactionAnomaly.transaction_id == transaction.id
+            ).delete(synchronize_session=False)
+
+        if not transaction.category_id or transaction.type != "expense":
+            return None
+
+        if sign > 0:
+            # Создаем строку заранее: FOR UPDATE не блокирует несуществующую строку,
+            # и параллельные первые расходы категории конфликтовали бы по ключу
+            db.execute(upsert_insert(db, models.CategoryStats).values(
+                category_id=transaction.category_id, count=0, mean=0.0, m2=0.0, sketch="{}"
+            ).on_conflict_do_nothing(index_elements=["category_id"]))
+
+        stats = db.query(models.CategoryStats).filter(
+            models.CategoryStats.category_id == transaction.category_id
+        ).with_for_update().first()
+
+        if stats is None:
+            return None
+
+        value = transaction.amount
+        sketch = json.loads(stats.sketch)
+        score = None
+
+        if sign > 0:
+            score = anomaly_score(stats, value)
+            if score is not None and score >= ANOMALY_THRESHOLD:
+                db.add(models.TransactionAnomaly(
+                    transaction=transaction,
+                    category_id=transaction.category_id,
+                    score=score,
+                    typical_amount=sketch_quantile(sketch, 0.5),
+                    created_at=transaction.created_at
+                ))
+            stats.count, stats.mean, stats.m2 = welford_add(stats.count, stats.mean, stats.m2, value)
+        else:
+            stats.count, stats.mean, stats.m2 = welford_remove(stats.count, stats.mean, stats.m2, value)
+
+        stats.sketch = json.dumps(sketch_update(sketch, value, sign))
+        return score
+
+    @staticmethod
+    def get_outliers(
+        db: Session,
+        limit: int = 20,
+        category_id: Optional[int] = None
+    ) -> List[schemas.OutlierResponse]:
+        """Последние выбросы по индексу дат, без сканирования истории"""
+        query = db.query(
+            models.Transaction,
+            models.TransactionAnomaly.score,
+            models.TransactionAnomaly.typical_amount
+        ).join(
+            models.TransactionAnomaly,
+            models.TransactionAnomaly.transaction_id == models.Transaction.id
+        )
+        if category_id:
+            query = query.filter(models.TransactionAnomaly.category_id == category_id)
+
+        rows = query.order_by(models.TransactionAnomaly.created_at.desc()).limit(limit).all()
+
+        return [
+            schemas.OutlierResponse(
+                **schemas.TransactionResponse.model_validate(transaction).dict(),
+                anomaly_score=score,
+                typical_amount=typical_amount
+            )
+            for transaction, score, typical_amount in rows
+        ]
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """
+        Пересчитать статистику всех категорий одним потоковым проходом.
+
+        Расходы воспроизводятся в порядке created_at, и каждый оценивается
+        по статистике до него — так же, как при записи через API.
+        Не коммитит. Возвращает количество категорий.
+        """
+        db.query(models.TransactionAnomaly).delete(synchronize_session=False)
+        db.query(models.CategoryStats).delete(synchronize_session=False)
+
+        rows = db.query(
+            models.Transaction.id,
+            models.Transaction.category_id,
+            models.Transaction.amount,
+            models.Transaction.created_at
+        ).filter(
+            models.Transaction.category_id.isnot(None),
+            models.Transaction.type == "expense"
+        ).order_by(
+            models.Transaction.created_at,
+            models.Transaction.id
+        ).yield_per(1000)
+
+        stats = {}
+        anomalies = []
+        for transaction_id, category_id, amount, created_at in rows:
+            if category_id not in stats:
+                stats[category_id] = models.CategoryStats(
+                    category_id=category_id, count=0, mean=0.0, m2=0.0, sketch={}
+                )
+            item = stats[category_id]
+
+            score = anomaly_score(item, amount)
+            if score is not None and score >= ANOMALY_THRESHOLD:
+                anomalies.append(models.TransactionAnomaly(
+                    transaction_id=transaction_id,
+                    category_id=category_id,
+                    score=score,
+                    typical_amount=sketch_quantile(item.sketch, 0.5),
+                    created_at=created_at
+                ))
+
+            item.count, item.mean, item.m2 = welford_add(item.count, item.mean, item.m2, amount)
+            sketch_update(item.sketch, amount)
+
+        for item in stats.values():
+            item.sketch = json.dumps(item.sketch)
+        db.add_all(stats.values())
+        db.add_all(anomalies)
+        db.flush()
+
+        return len(stats)
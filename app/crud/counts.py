@@ -0,0 +1,167 @@
+# app/crud/counts.py
+import json
+import os
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.cache import TTLCache
+
+TRANSACTION_TYPES = ("income", "expense")
+COUNTER_KEYS = ("all",) + TRANSACTION_TYPES
+# Версия данных: растет на 1 при каждой записи транзакции (в той же
+# транзакции БД), по ней воркеры отчетов замечают изменения во время рендеринга
+DATA_VERSION_KEY = "data_version"
+
+# Кэш точных COUNT(*) для произвольных комбинаций фильтров
+COUNT_CACHE_SECONDS = int(os.getenv("COUNT_CACHE_SECONDS", "30"))
+_count_cache = TTLCache(ttl=COUNT_CACHE_SECONDS)
+
+
+def filter_transactions(
+    query: Query,
+    type: Optional[str] = None,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Query:
+    """Применить фильтры списка транзакций (неизвестный type игнорируется)"""
+    if type and type in TRANSACTION_TYPES:
+        query = query.filter(models.Transaction.type == type)
+    if category_id:
+        query = query.filter(models.Transaction.category_id == category_id)
+    if start_date:
+        query = query.filter(models.Transaction.created_at >= start_date)
+    if end_date:
+        query = query.filter(models.Transaction.created_at <= end_date)
+    return query
+
+
+class TransactionCountCRUD:
+    @staticmethod
+    def _current_values(db: Session) -> dict:
+        """Значения счетчиков, посчитанные по таблице транзакций"""
+        by_type = dict(db.query(
+            models.Transaction.type,
+            func.count(models.Transaction.id)
+        ).group_by(models.Transaction.type).all())
+        values = {"all": sum(by_type.values())}
+        values.update({key: by_type.get(key, 0) for key in TRANSACTION_TYPES})
+        return values
+
+    @staticmethod
+    def ensure_counters(db: Session) -> None:
+        """Создать недостающие счетчики по текущим данным (при старте приложения)"""
+        existing = {key for (key,) in db.query(models.TransactionCounter.key).all()}
+        missing = [key for key in COUNTER_KEYS + (DATA_VERSION_KEY,) if key not in existing]
+        if not missing:
+            return
+
+        values = TransactionCountCRUD._current_values(db)
+        db.add_all([
+            models.TransactionCounter(key=key, value=values.get(key, 0)) for key in missing
+        ])
+        try:
+            db.commit()
+        except IntegrityError:
+            # Другой воркер успел создать счетчики первым
+            db.rollback()
+
+    @staticmethod
+    def rebuild_counters(db: Session) -> dict:
+        """
+        Пересчитать все счетчики с нуля (например, после массового импорта).
+
+        Не коммитит. Возвращает новые значения.
+        """
+        db.query(models.TransactionCounter).filter(
+            models.TransactionCounter.key.in_(COUNTER_KEYS)
+        ).delete(synchronize_session=False)
+        values = TransactionCountCRUD._current_values(db)
+        db.add_all([
+            models.TransactionCounter(key=key, value=values[key]) for key in COUNTER_KEYS
+        ])
+        db.flush()
+        _count_cache.clear()
+        return values
+
+    @staticmethod
+    def apply_transaction(db: Session, type: Optional[str], sign: int = 1) -> None:
+        """Изменить счетчики на sign и увеличить версию данных. Не коммитит."""
+        keys = ["all", DATA_VERSION_KEY]
+        if type in TRANSACTION_TYPES:
+            keys.append(type)
+
+        db.query(models.TransactionCounter).filter(
+            models.TransactionCounter.key.in_(keys)
+        ).update(
+            {
+                models.TransactionCounter.value: models.TransactionCounter.value + case(
+                    (models.TransactionCounter.key == DATA_VERSION_KEY, 1),
+                    else_=sign
+                )
+            },
+            synchronize_session=False
+        )
+
+    @staticmethod
+    def data_version(db: Session) -> int:
+        """Текущая версия данных транзакций"""
+        return db.query(models.TransactionCounter.value).filter(
+            models.TransactionCounter.key == DATA_VERSION_KEY
+        ).scalar() or 0
+
+    @staticmethod
+    def count_transactions(
+        db: Session,
+        type: Optional[str] = None,
+        category_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        approximate: bool = False
+    ) -> int:
+        """
+        Количество транзакций под фильтрами.
+
+        Без фильтров и по типу — из поддерживаемых счетчиков (один keyed lookup).
+        Для прочих комбинаций — кэшированный на COUNT_CACHE_SECONDS COUNT(*),
+        а при approximate=True на PostgreSQL — оценка планировщика.
+        """
+        if type not in TRANSACTION_TYPES:
+            type = None
+
+        if not (category_id or start_date or end_date):
+            value = db.query(models.TransactionCounter.value).filter(
+                models.TransactionCounter.key == (type or "all")
+            ).scalar()
+            if value is not None:
+                return value
+
+        query = filter_transactions(
+            db.query(models.Transaction.id),
+            type=type,
+            category_id=category_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+        if approximate and db.bind.dialect.name == "postgresql":
+            return TransactionCountCRUD._planner_estimate(db, query)
+
+        key = (str(db.bind.url), type, category_id, start_date, end_date)
+        return _count_cache.get_or_set(key, lambda: query.count())
+
+    @staticmethod
+    def _planner_estimate(db: Session, query: Query) -> int:
+        """Оценка числа строк из EXPLAIN без выполнения запроса (PostgreSQL)"""
+        compiled = query.statement.compile(dialect=db.bind.dialect)
+        plan = db.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + str(compiled),
+            compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
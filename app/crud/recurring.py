@@ -0,0 +1,421 @@
+# app/crud/recurring.py
+import calendar
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Optional, List, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+
+from app import models, schemas
+from app.crud.counts import TRANSACTION_TYPES
+from app.crud.tracking import track_transaction
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+# Больше вхождений в одном окне не разворачивается (списки и /occurrences);
+# итоги для статистики считаются арифметически и не ограничены
+MAX_OCCURRENCES_PER_WINDOW = 5000
+
+
+class TooManyOccurrences(Exception):
+    """Окно разворачивается больше чем в MAX_OCCURRENCES_PER_WINDOW вхождений"""
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    """Сдвиг на months месяцев; день ограничивается концом месяца (31 янв -> 28/29 фев)"""
+    month_index = moment.month - 1 + months
+    year = moment.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def _nth_occurrence(frequency: str, interval: int, start: datetime, n: int) -> datetime:
+    if frequency == "daily":
+        return start + timedelta(days=n * interval)
+    if frequency == "weekly":
+        return start + timedelta(weeks=n * interval)
+    if frequency == "monthly":
+        return _add_months(start, n * interval)
+    return _add_months(start, 12 * n * interval)
+
+
+def _first_index(frequency: str, interval: int, start: datetime, moment: datetime) -> int:
+    """Номер вхождения не позже moment, с которого имеет смысл начинать поиск"""
+    if moment <= start:
+        return 0
+    if frequency in ("daily", "weekly"):
+        step = timedelta(days=interval if frequency == "daily" else 7 * interval)
+        return (moment - start) // step
+    step_months = interval if frequency == "monthly" else 12 * interval
+    months = (moment.year - start.year) * 12 + moment.month - start.month
+    return max(months // step_months - 1, 0)
+
+
+def _index_after(frequency: str, interval: int, start: datetime, moment: datetime, strict: bool) -> int:
+    """Номер первого вхождения >= moment (strict — строго > moment)"""
+    n = _first_index(frequency, interval, start, moment)
+    while True:
+        current = _nth_occurrence(frequency, interval, start, n)
+        if current > moment or (current == moment and not strict):
+            return n
+        n += 1
+
+
+def occurrence_range(
+    frequency: str,
+    interval: int,
+    start: datetime,
+    until: Optional[datetime],
+    count: Optional[int],
+    window_start: datetime,
+    window_end: datetime
+) -> Tuple[int, int]:
+    """
+    Номера вхождений [first, last) в окне [window_start, window_end].
+
+    Считается арифметически, без перебора: даты вхождений растут с номером.
+    """
+    if until is not None:
+        window_end = min(window_end, until)
+    if window_end < window_start:
+        return 0, 0
+
+    first = _index_after(frequency, interval, start, window_start, strict=False)
+    last = _index_after(frequency, interval, start, window_end, strict=True)
+    if count is not None:
+        last = min(last, count)
+    return first, max(first, last)
+
+
+@lru_cache(maxsize=4096)
+def expand_rule(
+    frequency: str,
+    interval: int,
+    start: datetime,
+    until: Optional[datetime],
+    count: Optional[int],
+    window_start: datetime,
+    window_end: datetime
+) -> Tuple[datetime, ...]:
+    """
+    Даты вхождений правила в окне [window_start, window_end].
+
+    Результат мемоизируется по параметрам правила и окну, поэтому
+    изменение правила автоматически дает новый ключ кэша.
+    """
+    first, last = occurrence_range(frequency, interval, start, until, count, window_start, window_end)
+    return tuple(_nth_occurrence(frequency, interval, start, n) for n in range(first, last))
+
+
+def _align_window(window_start: datetime, window_end: datetime) -> Tuple[datetime, datetime]:
+    """Расширить окно до границ суток, чтобы окна вида [..., now()] давали один ключ кэша"""
+    aligned_start = window_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    aligned_end = window_end.replace(hour=0, minute=0, second=0, microsecond=0)
+    if aligned_end < window_end:
+        aligned_end += timedelta(days=1)
+    return aligned_start, aligned_end
+
+
+def _rule_params(rule: models.RecurringRule) -> tuple:
+    return rule.frequency, rule.interval, rule.start_date, rule.until, rule.count
+
+
+def _rule_occurrences(rule: models.RecurringRule, window_start: datetime, window_end: datetime):
+    occurrences = expand_rule(*_rule_params(rule), *_align_window(window_start, window_end))
+    return occurrences[
+        bisect_left(occurrences, window_start):bisect_right(occurrences, window_end)
+    ]
+
+
+def _rule_occurrence_count(rule: models.RecurringRule, window_start: datetime, window_end: datetime) -> int:
+    first, last = occurrence_range(*_rule_params(rule), window_start, window_end)
+    return last - first
+
+
+class RecurringCRUD:
+    @staticmethod
+    def get_rule(db: Session, rule_id: int) -> Optional[models.RecurringRule]:
+        """Получить правило по ID"""
+        return db.query(models.RecurringRule).filter(
+            models.RecurringRule.id == rule_id
+        ).first()
+
+    @staticmethod
+    def get_rules(db: Session, skip: int = 0, limit: int = 100) -> List[models.RecurringRule]:
+        """Получить список правил"""
+        return db.query(models.RecurringRule).order_by(
+            models.RecurringRule.id
+        ).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def create_rule(db: Session, rule: schemas.RecurringRuleCreate) -> models.RecurringRule:
+        """Создать правило"""
+        db_rule = models.RecurringRule(**rule.dict())
+
+        db.add(db_rule)
+        db.commit()
+        db.refresh(db_rule)
+
+        return db_rule
+
+    @staticmethod
+    def update_rule(
+        db: Session,
+        db_rule: models.RecurringRule,
+        rule_update: schemas.RecurringRuleUpdate
+    ) -> models.RecurringRule:
+        """Обновить правило (подтвержденные транзакции не меняются)"""
+        for field, value in rule_update.dict(exclude_unset=True).items():
+            setattr(db_rule, field, value)
+
+        db.commit()
+        db.refresh(db_rule)
+
+        return db_rule
+
+    @staticmethod
+    def delete_rule(db: Session, db_rule: models.RecurringRule) -> None:
+        """Удалить правило; подтвержденные транзакции остаются"""
+        db.delete(db_rule)
+        db.commit()
+
+    @staticmethod
+    def _rules_in_window(
+        db: Session,
+        window_start: datetime,
+        window_end: datetime,
+        type: Optional[str] = None,
+        category_id: Optional[int] = None,
+        rule_id: Optional[int] = None
+    ) -> List[models.RecurringRule]:
+        query = db.query(models.RecurringRule).filter(
+            and_(
+                models.RecurringRule.start_date <= window_end,
+                or_(
+                    models.RecurringRule.until.is_(None),
+                    models.RecurringRule.until >= window_start
+                )
+            )
+        )
+        if type and type in TRANSACTION_TYPES:
+            query = query.filter(models.RecurringRule.type == type)
+        if category_id:
+            query = query.filter(models.RecurringRule.category_id == category_id)
+        if rule_id:
+            query = query.filter(models.RecurringRule.id == rule_id)
+        return query.all()
+
+    @staticmethod
+    def _check_window_size(
+        rules: List[models.RecurringRule],
+        window_start: datetime,
+        window_end: datetime
+    ) -> None:
+        """Не разворачивать окно, в котором слишком много вхождений"""
+        total = sum(_rule_occurrence_count(rule, window_start, window_end) for rule in rules)
+        if total > MAX_OCCURRENCES_PER_WINDOW:
+            raise TooManyOccurrences()
+
+    @staticmethod
+    def _resolved_occurrences(
+        db: Session,
+        rule_ids: List[int],
+        window_start: datetime,
+        window_end: datetime
+    ) -> dict:
+        """(rule_id, occurrence_date) -> transaction_id для подтвержденных и пропущенных"""
+        if not rule_ids:
+            return {}
+        rows = db.query(
+            models.RecurringOccurrence.rule_id,
+            models.RecurringOccurrence.occurrence_date,
+            models.RecurringOccurrence.transaction_id
+        ).filter(
+            and_(
+                models.RecurringOccurrence.rule_id.in_(rule_ids),
+                models.RecurringOccurrence.occurrence_date >= window_start,
+                models.RecurringOccurrence.occurrence_date <= window_end
+            )
+        ).all()
+        return {(rule_id, moment): transaction_id for rule_id, moment, transaction_id in rows}
+
+    @staticmethod
+    def get_occurrences(
+        db: Session,
+        window_start: datetime,
+        window_end: datetime,
+        type: Optional[str] = None,
+        category_id: Optional[int] = None,
+        rule_id: Optional[int] = None
+    ) -> List[schemas.RecurringOccurrenceResponse]:
+        """
+        Все вхождения правил в окне со статусом, по возрастанию даты.
+
+        Если вхождений больше MAX_OCCURRENCES_PER_WINDOW — TooManyOccurrences.
+        """
+        rules = RecurringCRUD._rules_in_window(
+            db, window_start, window_end, type=type, category_id=category_id, rule_id=rule_id
+        )
+        RecurringCRUD._check_window_size(rules, window_start, window_end)
+        resolved = RecurringCRUD._resolved_occurrences(
+            db, [rule.id for rule in rules], window_start, window_end
+        )
+
+        occurrences = []
+        for rule in rules:
+            for moment in _rule_occurrences(rule, window_start, window_end):
+                key = (rule.id, moment)
+                if key not in resolved:
+                    status, transaction_id = "pending", None
+                elif resolved[key] is None:
+                    status, transaction_id = "skipped", None
+                else:
+                    status, transaction_id = "confirmed", resolved[key]
+
+                occurrences.append(schemas.RecurringOccurrenceResponse(
+                    rule_id=rule.id,
+                    occurrence_date=moment,
+                    amount=rule.amount,
+                    description=rule.description,
+                    type=rule.type,
+                    category_id=rule.category_id,
+                    status=status,
+                    transaction_id=transaction_id
+                ))
+
+        occurrences.sort(key=lambda item: item.occurrence_date)
+        return occurrences
+
+    @staticmethod
+    def virtual_transactions(
+        db: Session,
+        window_start: datetime,
+        window_end: datetime,
+        type: Optional[str] = None,
+        category_id: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Неподтвержденные вхождения в виде строк транзакций (id=None),
+        от новых к старым — как в списке транзакций.
+
+        Если вхождений больше MAX_OCCURRENCES_PER_WINDOW — TooManyOccurrences.
+        """
+        rules = RecurringCRUD._rules_in_window(
+            db, window_start, window_end, type=type, category_id=category_id
+        )
+        RecurringCRUD._check_window_size(rules, window_start, window_end)
+        resolved = RecurringCRUD._resolved_occurrences(
+            db, [rule.id for rule in rules], window_start, window_end
+        )
+
+        rows = [
+            {
+                "amount": rule.amount,
+                "description": rule.description,
+                "type": rule.type,
+                "category_id": rule.category_id,
+                "id": None,
+                "created_at": moment,
+                "recurring_rule_id": rule.id,
+            }
+            for rule in rules
+            for moment in _rule_occurrences(rule, window_start, window_end)
+            if (rule.id, moment) not in resolved
+        ]
+        rows.sort(key=lambda row: row["created_at"], reverse=True)
+        return rows
+
+    @staticmethod
+    def is_occurrence(rule: models.RecurringRule, moment: datetime) -> bool:
+        """Является ли moment датой вхождения правила (без кэша разворачивания)"""
+        return _rule_occurrence_count(rule, moment, moment) > 0
+
+    @staticmethod
+    def is_resolved(db: Session, rule_id: int, moment: datetime) -> bool:
+        return db.query(models.RecurringOccurrence).filter(
+            and_(
+                models.RecurringOccurrence.rule_id == rule_id,
+                models.RecurringOccurrence.occurrence_date == moment
+            )
+        ).first() is not None
+
+    @staticmethod
+    def confirm_occurrence(
+        db: Session,
+        rule: models.RecurringRule,
+        confirm: schemas.OccurrenceConfirm
+    ) -> Tuple[models.Transaction, dict]:
+        """Материализовать вхождение в настоящую транзакцию"""
+        overrides = confirm.dict(exclude_none=True, exclude={"occurrence_date"})
+        db_transaction = models.Transaction(
+            amount=overrides.get("amount", rule.amount),
+            description=overrides.get("description", rule.description),
+            type=rule.type,
+            category_id=overrides.get("category_id", rule.category_id),
+            created_at=confirm.occurrence_date
+        )
+
+        db.add(db_transaction)
+        flags = track_transaction(db, db_transaction, 1)
+        db.flush()
+        db.add(models.RecurringOccurrence(
+            rule_id=rule.id,
+            occurrence_date=confirm.occurrence_date,
+            transaction_id=db_transaction.id
+        ))
+        db.commit()
+        db.refresh(db_transaction)
+
+        return db_transaction, flags
+
+    @staticmethod
+    def skip_occurrence(db: Session, rule: models.RecurringRule, moment: datetime) -> None:
+        """Пометить вхождение пропущенным (без транзакции)"""
+        db.add(models.RecurringOccurrence(rule_id=rule.id, occurrence_date=moment))
+        db.commit()
+
+    @staticmethod
+    def release_transaction(db: Session, transaction_id: int) -> None:
+        """При удалении транзакции ее вхождение становится пропущенным. Не коммитит."""
+        db.query(models.RecurringOccurrence).filter(
+            models.RecurringOccurrence.transaction_id == transaction_id
+        ).update(
+            {models.RecurringOccurrence.transaction_id: None},
+            synchronize_session=False
+        )
+
+    @staticmethod
+    def window_totals(
+        db: Session,
+        window_start: datetime,
+        window_end: datetime
+    ) -> dict:
+        """
+        Суммы и количество неподтвержденных вхождений по типам.
+
+        Считается арифметически по каждому правилу, без разворачивания окна,
+        поэтому работает для окон любой длины.
+        """
+        totals = {key: {"total": 0.0, "count": 0} for key in TRANSACTION_TYPES}
+        rules = {
+            rule.id: rule
+            for rule in RecurringCRUD._rules_in_window(db, window_start, window_end)
+            if rule.type in totals
+        }
+
+        for rule in rules.values():
+            count = _rule_occurrence_count(rule, window_start, window_end)
+            totals[rule.type]["total"] += count * rule.amount
+            totals[rule.type]["count"] += count
+
+        # Подтвержденные и пропущенные вхождения уже не прогноз
+        resolved = RecurringCRUD._resolved_occurrences(db, list(rules), window_start, window_end)
+        for rule_id, moment in resolved:
+            rule = rules[rule_id]
+            if RecurringCRUD.is_occurrence(rule, moment):
+                totals[rule.type]["total"] -= rule.amount
+                totals[rule.type]["count"] -= 1
+
+        return totals
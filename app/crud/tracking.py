@@ -0,0 +1,52 @@
+# app/crud/tracking.py
+"""
+Инкрементальные счетчики, которые обновляются при каждой записи транзакции.
+
+track_transaction вызывается в той же транзакции БД, что и создание,
+изменение или удаление строки, и не делает commit сам. Закэшированные
+выписки сбрасываются только после успешного commit.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import models, reports
+from app.crud.budget import BudgetCRUD
+from app.crud.counts import TransactionCountCRUD
+from app.crud.category_stats import CategoryStatsCRUD
+
+# Моменты измененных транзакций, ожидающие commit (в Session.info)
+_CHANGED_MOMENTS = "changed_transaction_moments"
+
+
+def track_transaction(db: Session, transaction: models.Transaction, sign: int = 1) -> dict:
+    """
+    Учесть транзакцию во всех счетчиках (sign=-1 — откатить ее вклад).
+
+    Возвращает флаги для ответа API (over_budget, anomaly_score).
+    """
+    TransactionCountCRUD.apply_transaction(db, transaction.type, sign)
+    over_budget = BudgetCRUD.apply_transaction(
+        db,
+        category_id=transaction.category_id,
+        type=transaction.type,
+        amount=transaction.amount,
+        created_at=transaction.created_at,
+        sign=sign
+    )
+    anomaly_score = CategoryStatsCRUD.apply_transaction(db, transaction, sign)
+    if transaction.created_at is not None:
+        db.info.setdefault(_CHANGED_MOMENTS, []).append(transaction.created_at)
+    return {"over_budget": over_budget, "anomaly_score": anomaly_score}
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_reports(session: Session) -> None:
+    # Выписки за периоды после самой ранней измененной транзакции больше не актуальны
+    moments = session.info.pop(_CHANGED_MOMENTS, None)
+    if moments:
+        reports.invalidate_cached(min(moments))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session: Session) -> None:
+    session.info.pop(_CHANGED_MOMENTS, None)
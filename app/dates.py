@@ -0,0 +1,17 @@
+# app/dates.py
+"""
+Все даты в БД хранятся как naive локальное время (datetime.now()).
+
+Даты с часовым поясом из запросов (например, 2026-01-01T00:00:00Z)
+приводятся к нему на входе в API, чтобы их можно было сравнивать
+с датами из БД и вхождениями повторяющихся правил.
+"""
+from datetime import datetime
+from typing import Optional
+
+
+def to_local_naive(moment: Optional[datetime]) -> Optional[datetime]:
+    """Перевести дату с часовым поясом в naive локальное время"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone().replace(tzinfo=None)
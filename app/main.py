@@ -1,10 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import List, Optional, Literal
+from datetime import datetime, timedelta
+import heapq
 import os
 import sys
 
@@ -13,15 +14,28 @@ print("🚀 Запуск MoonTracker...")
 print(f"📅 Время запуска: {datetime.now()}")
 print(f"🐍 Версия Python: {sys.version}")
 
-from app.database import engine, get_db
+from app.database import (
+    engine, replica_engine, get_db, SessionLocal,
+    READ_METHODS, READ_YOUR_WRITES_COOKIE, READ_YOUR_WRITES_SECONDS
+)
 from app import models
 from app import schemas
+from app import serialization
+from app.crud.tracking import track_transaction
+from app.crud.counts import TransactionCountCRUD, filter_transactions
+from app.crud.recurring import RecurringCRUD, TooManyOccurrences
+from app.dates import to_local_naive
+from app.crud.category_stats import CategoryStatsCRUD
+from app.routers import budgets, recurring, reports
+from app.reports import shutdown_executor, recover_jobs, cleanup_job_artifacts
 
 # Создаем таблицы
 print("🔄 Создание таблиц базы данных...")
 try:
     models.Base.metadata.create_all(bind=engine)
     print("✅ Таблицы созданы успешно")
+    with SessionLocal() as db:
+        TransactionCountCRUD.ensure_counters(db)
 except Exception as e:
     print(f"⚠️ Предупреждение: Не удалось создать таблицы: {e}")
 
@@ -35,6 +49,22 @@ app = FastAPI(
     openapi_url="/api/openapi.json"
 )
 
+# Read-your-writes: после успешной записи клиент несколько секунд
+# читает с основной БД, а не с реплики (см. app.database.get_db)
+if replica_engine is not None:
+    @app.middleware("http")
+    async def mark_recent_writes(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in READ_METHODS and response.status_code < 400:
+            response.set_cookie(
+                READ_YOUR_WRITES_COOKIE, "1",
+                max_age=READ_YOUR_WRITES_SECONDS,
+                httponly=True,
+                samesite="lax"
+            )
+        return response
+    print(f"✅ Реплика для чтения подключена: {replica_engine.url}")
+
 # Подключаем статические файлы и шаблоны
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -48,6 +78,23 @@ else:
 
 # ==================== РОУТЫ ====================
 
+app.include_router(budgets.router)
+app.include_router(recurring.router)
+app.include_router(reports.router)
+
+@app.on_event("startup")
+def start_report_workers():
+    # Задания, не завершенные до перезапуска, снова ставятся в очередь
+    try:
+        cleanup_job_artifacts()
+        recover_jobs()
+    except Exception as e:
+        print(f"⚠️ Предупреждение: Не удалось восстановить очередь отчетов: {e}")
+
+@app.on_event("shutdown")
+def stop_report_workers():
+    shutdown_executor()
+
 # Главная страница
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -109,7 +156,7 @@ def check_database(db: Session = Depends(get_db)):
 
 # ==================== ТРАНЗАКЦИИ ====================
 
-@app.post("/api/v1/transactions", response_model=schemas.TransactionResponse)
+@app.post("/api/v1/transactions", response_model=schemas.TransactionWriteResponse)
 def create_transaction(
     transaction: schemas.TransactionCreate, 
     db: Session = Depends(get_db)
@@ -120,26 +167,108 @@ def create_transaction(
         created_at=datetime.now()
     )
     db.add(db_transaction)
+    # Счетчики обновляются в той же транзакции БД
+    flags = track_transaction(db, db_transaction, 1)
     db.commit()
     db.refresh(db_transaction)
-    return db_transaction
+    return schemas.TransactionWriteResponse.model_validate(db_transaction).model_copy(update=flags)
 
 @app.get("/api/v1/transactions", response_model=List[schemas.TransactionResponse])
 def get_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     type: str = None,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    fast: bool = False,
+    count: Optional[Literal["exact", "approx"]] = None,
+    include_recurring: bool = False,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Transaction)
+    # fast=true: выбираем кортежи и сериализуем их напрямую, минуя
+    # построение Pydantic-модели на каждую строку
+    # count=exact|approx: добавляет заголовки X-Total-Count и X-Has-More
+    # include_recurring=true: подмешивает неподтвержденные вхождения
+    # повторяющихся транзакций; окно по умолчанию — последние 30 дней
+    start_date, end_date = to_local_naive(start_date), to_local_naive(end_date)
+    virtual = []
+    if include_recurring:
+        end_date = end_date or datetime.now()
+        start_date = start_date or end_date - timedelta(days=30)
+        try:
+            virtual = RecurringCRUD.virtual_transactions(
+                db, start_date, end_date, type=type, category_id=category_id
+            )
+        except TooManyOccurrences:
+            raise HTTPException(
+                status_code=400,
+                detail="Too many recurring occurrences in window, narrow start_date/end_date"
+            )
+        fast = True
+    
+    if fast:
+        columns = [
+            getattr(models.Transaction, field)
+            for field in serialization.TRANSACTION_FIELDS
+        ]
+        query = db.query(*columns)
+    else:
+        query = db.query(models.Transaction)
+    
+    query = filter_transactions(
+        query,
+        type=type,
+        category_id=category_id,
+        start_date=start_date,
+        end_date=end_date
+    ).order_by(models.Transaction.created_at.desc())
     
-    if type and type in ['income', 'expense']:
-        query = query.filter(models.Transaction.type == type)
+    # Берем на одну строку больше, чтобы узнать has_more без COUNT
+    page_size = limit + 1 if count else limit
     
-    return query.order_by(models.Transaction.created_at.desc())\
-                .offset(skip)\
-                .limit(limit)\
-                .all()
+    if include_recurring:
+        # Вхождения сливаются с первыми skip + limit строками БД
+        rows = query.add_columns(models.RecurringOccurrence.rule_id).outerjoin(
+            models.RecurringOccurrence,
+            models.RecurringOccurrence.transaction_id == models.Transaction.id
+        ).limit(skip + page_size).all()
+        stored = serialization.rows_to_dicts(
+            rows, serialization.TRANSACTION_FIELDS + ("recurring_rule_id",)
+        )
+        rows = list(heapq.merge(
+            stored, virtual, key=lambda row: row["created_at"], reverse=True
+        ))[skip:skip + page_size]
+    else:
+        rows = query.offset(skip).limit(page_size).all()
+    
+    headers = {}
+    if count:
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        total = TransactionCountCRUD.count_transactions(
+            db,
+            type=type,
+            category_id=category_id,
+            start_date=start_date,
+            end_date=end_date,
+            approximate=count == "approx"
+        ) + len(virtual)
+        headers = {
+            "X-Total-Count": str(max(total, skip + len(rows))),
+            "X-Has-More": "true" if has_more else "false"
+        }
+    
+    if include_recurring:
+        content = serialization.dump_occurrence_dicts(rows)
+    elif fast:
+        content = serialization.dump_transaction_rows(rows)
+    else:
+        response.headers.update(headers)
+        return rows
+    
+    return Response(content=content, media_type="application/json", headers=headers)
 
 @app.get("/api/v1/transactions/{id}", response_model=schemas.TransactionResponse)
 def get_transaction(id: int, db: Session = Depends(get_db)):
@@ -148,15 +277,50 @@ def get_transaction(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Transaction not found")
     return transaction
 
+@app.put("/api/v1/transactions/{id}", response_model=schemas.TransactionWriteResponse)
+def update_transaction(
+    id: int,
+    transaction_update: schemas.TransactionUpdate,
+    db: Session = Depends(get_db)
+):
+    transaction = db.query(models.Transaction).filter(models.Transaction.id == id).first()
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    # category_id можно сбросить в null, а amount и type — нет
+    update_data = transaction_update.dict(exclude_unset=True)
+    for field in ("amount", "type"):
+        if field in update_data and update_data[field] is None:
+            raise HTTPException(status_code=400, detail=f"Field '{field}' cannot be null")
+
+    # Откатываем вклад старой версии и учитываем новую
+    track_transaction(db, transaction, -1)
+    for field, value in update_data.items():
+        setattr(transaction, field, value)
+    flags = track_transaction(db, transaction, 1)
+    
+    db.commit()
+    db.refresh(transaction)
+    return schemas.TransactionWriteResponse.model_validate(transaction).model_copy(update=flags)
+
 @app.delete("/api/v1/transactions/{id}")
 def delete_transaction(id: int, db: Session = Depends(get_db)):
     transaction = db.query(models.Transaction).filter(models.Transaction.id == id).first()
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    track_transaction(db, transaction, -1)
+    RecurringCRUD.release_transaction(db, transaction.id)
     db.delete(transaction)
     db.commit()
     return {"message": "Transaction deleted successfully"}
 
+@app.post("/api/v1/transactions/counters/rebuild")
+def rebuild_transaction_counters(db: Session = Depends(get_db)):
+    # Пересчет счетчиков X-Total-Count после массового импорта
+    counters = TransactionCountCRUD.rebuild_counters(db)
+    db.commit()
+    return {"message": "Transaction counters rebuilt", "counters": counters}
+
 # ==================== КАТЕГОРИИ ====================
 
 @app.post("/api/v1/categories", response_model=schemas.CategoryResponse)
@@ -174,26 +338,48 @@ def get_categories(db: Session = Depends(get_db)):
 # ==================== СТАТИСТИКА ====================
 
 @app.get("/api/v1/stats")
-def get_stats(db: Session = Depends(get_db)):
+def get_stats(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_recurring: bool = False,
+    db: Session = Depends(get_db)
+):
     from sqlalchemy import func
     
+    # Окно (опционально) и прогноз по повторяющимся транзакциям
+    # (include_recurring; окно по умолчанию — текущий месяц)
+    start_date, end_date = to_local_naive(start_date), to_local_naive(end_date)
+    if include_recurring:
+        start_date = start_date or datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_date = end_date or datetime.now()
+    
+    def in_window(query):
+        return filter_transactions(query, start_date=start_date, end_date=end_date)
+    
     # Общая статистика
-    total_income = db.query(func.sum(models.Transaction.amount)).filter(
+    total_income = in_window(db.query(func.sum(models.Transaction.amount)).filter(
         models.Transaction.type == "income"
-    ).scalar() or 0
+    )).scalar() or 0
     
-    total_expense = db.query(func.sum(models.Transaction.amount)).filter(
+    total_expense = in_window(db.query(func.sum(models.Transaction.amount)).filter(
         models.Transaction.type == "expense"
-    ).scalar() or 0
+    )).scalar() or 0
     
     # Количество транзакций
-    count_income = db.query(func.count(models.Transaction.id)).filter(
+    count_income = in_window(db.query(func.count(models.Transaction.id)).filter(
         models.Transaction.type == "income"
-    ).scalar() or 0
+    )).scalar() or 0
     
-    count_expense = db.query(func.count(models.Transaction.id)).filter(
+    count_expense = in_window(db.query(func.count(models.Transaction.id)).filter(
         models.Transaction.type == "expense"
-    ).scalar() or 0
+    )).scalar() or 0
+    
+    if include_recurring:
+        recurring = RecurringCRUD.window_totals(db, start_date, end_date)
+        total_income += recurring["income"]["total"]
+        total_expense += recurring["expense"]["total"]
+        count_income += recurring["income"]["count"]
+        count_expense += recurring["expense"]["count"]
     
     return {
         "total_income": float(total_income),
@@ -208,9 +394,27 @@ def get_stats(db: Session = Depends(get_db)):
             "avg_income": float(total_income / count_income) if count_income > 0 else 0,
             "avg_expense": float(total_expense / count_expense) if count_expense > 0 else 0
         },
+        "start_date": start_date,
+        "end_date": end_date,
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/api/v1/stats/outliers", response_model=List[schemas.OutlierResponse])
+def get_outliers(
+    limit: int = 20,
+    category_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # Последние транзакции с необычно большой для категории суммой
+    return CategoryStatsCRUD.get_outliers(db, limit=min(limit, 100), category_id=category_id)
+
+@app.post("/api/v1/stats/outliers/rebuild")
+def rebuild_category_stats(db: Session = Depends(get_db)):
+    # Пересчет потоковой статистики после массового импорта
+    categories = CategoryStatsCRUD.rebuild(db)
+    db.commit()
+    return {"message": "Category stats rebuilt", "categories": categories}
+
 # ==================== ИНФОРМАЦИЯ О СИСТЕМЕ ====================
 
 @app.get("/api/v1/system/info")
@@ -231,4 +435,7 @@ print(f"   • Главная страница: /")
 print(f"   • API документация: /api/docs")
 print(f"   • Здоровье системы: /health")
 print(f"   • Статистика: /api/v1/stats")
-print(f"   • Транзакции: /api/v1/transactions")
\ No newline at end of file
+print(f"   • Транзакции: /api/v1/transactions")
+print(f"   • Бюджеты: /api/v1/budgets")
+print(f"   • Повторяющиеся: /api/v1/recurring")
+print(f"   • Отчеты: /api/v1/reports")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -26,4 +26,106 @@ class Transaction(Base):
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     
     # Связь с категорией
-    category = relationship("Category", back_populates="transactions")
\ No newline at end of file
+    category = relationship("Category", back_populates="transactions")
+
+class Budget(Base):
+    __tablename__ = "budgets"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
+    amount = Column(Float, nullable=False)  # лимит на период
+    period = Column(String, nullable=False, default="month")  # 'month', 'week' или 'custom'
+    start_date = Column(Date, nullable=True)  # только для 'custom'
+    end_date = Column(Date, nullable=True)  # только для 'custom'
+    created_at = Column(DateTime, default=datetime.now)
+    
+    category = relationship("Category")
+    spends = relationship("BudgetSpend", back_populates="budget", cascade="all, delete-orphan")
+
+class BudgetSpend(Base):
+    """Инкрементальный счетчик расходов бюджета за один период"""
+    __tablename__ = "budget_spends"
+    
+    budget_id = Column(Integer, ForeignKey("budgets.id"), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    spent = Column(Float, nullable=False, default=0)
+    
+    budget = relationship("Budget", back_populates="spends")
+
+
+class TransactionCounter(Base):
+    """Поддерживаемое количество транзакций: 'all', 'income', 'expense'"""
+    __tablename__ = "transaction_counters"
+    
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class RecurringRule(Base):
+    """Правило повторяющейся транзакции (аналог RRULE); вхождения не хранятся"""
+    __tablename__ = "recurring_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    amount = Column(Float, nullable=False)
+    description = Column(String)
+    type = Column(String)  # 'income' или 'expense'
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    
+    frequency = Column(String, nullable=False, default="monthly")  # 'daily', 'weekly', 'monthly' или 'yearly'
+    interval = Column(Integer, nullable=False, default=1)
+    start_date = Column(DateTime, nullable=False)
+    until = Column(DateTime, nullable=True)
+    count = Column(Integer, nullable=True)  # максимум вхождений
+    created_at = Column(DateTime, default=datetime.now)
+    
+    occurrences = relationship("RecurringOccurrence", back_populates="rule", cascade="all, delete-orphan")
+
+class RecurringOccurrence(Base):
+    """Вхождение правила, подтвержденное (есть транзакция) или пропущенное (transaction_id пуст)"""
+    __tablename__ = "recurring_occurrences"
+    
+    rule_id = Column(Integer, ForeignKey("recurring_rules.id"), primary_key=True)
+    occurrence_date = Column(DateTime, primary_key=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True, index=True)
+    
+    rule = relationship("RecurringRule", back_populates="occurrences")
+
+
+class CategoryStats(Base):
+    """Потоковая статистика сумм по категории: Welford + квантильный скетч"""
+    __tablename__ = "category_stats"
+    
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0)
+    m2 = Column(Float, nullable=False, default=0)  # сумма квадратов отклонений
+    sketch = Column(Text, nullable=False, default="{}")  # JSON: корзина -> количество
+
+class TransactionAnomaly(Base):
+    """Транзакция, сумма которой необычна для ее категории"""
+    __tablename__ = "transaction_anomalies"
+    
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    score = Column(Float, nullable=False)
+    typical_amount = Column(Float, nullable=True)  # медиана категории на момент записи
+    created_at = Column(DateTime, nullable=False, index=True)  # дата транзакции
+    
+    transaction = relationship("Transaction")
+
+
+class ReportJob(Base):
+    """Задание на генерацию выписки за месяц или год"""
+    __tablename__ = "report_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String, nullable=False)  # 'month' или 'year'
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=True)  # только для 'month'
+    format = Column(String, nullable=False, default="csv")  # 'csv' или 'html'
+    status = Column(String, nullable=False, default="pending")  # 'pending', 'running', 'done', 'failed'
+    artifact_path = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)  # сколько раз возвращено в очередь при старте
+    created_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,447 @@
+# app/reports.py
+"""
+Фоновая генерация выписок (CSV и HTML) в пуле процессов.
+
+Обработчик запроса только создает ReportJob и ставит его в очередь;
+рендеринг идет в отдельном процессе с пониженным приоритетом, который
+читает транзакции потоком. Выписки за закрытые периоды сохраняются на
+диск и переиспользуются, пока не изменятся транзакции этого периода или
+более ранние (от них зависит входящий остаток).
+"""
+import csv
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import partial
+from typing import Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import func, case, and_
+
+from app import models
+from app.crud.counts import TransactionCountCRUD
+from app.database import SessionLocal
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "./reports")
+TEMPLATES_DIR = "templates"
+
+# Сколько процессов рендеринга у каждого процесса API (при gunicorn --workers N
+# всего рендерится до N * REPORT_WORKERS отчетов) и сколько заданий может
+# быть в очереди на все процессы вместе (считается по report_jobs в БД)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "1"))
+REPORT_MAX_PENDING = int(os.getenv("REPORT_MAX_PENDING", "10"))
+# Сколько часов хранятся файлы отдельных заданий (REPORTS_DIR/jobs)
+REPORT_JOB_RETENTION_HOURS = float(os.getenv("REPORT_JOB_RETENTION_HOURS", "24"))
+# Сколько раз незавершенное задание возвращается в очередь при старте
+REPORT_MAX_ATTEMPTS = 3
+# Приоритет (nice) процессов-воркеров, чтобы отчеты не отнимали CPU у API
+REPORT_NICE = int(os.getenv("REPORT_NICE", "10"))
+# Сколько раз перерендерить выписку, если транзакции менялись во время рендеринга
+REPORT_RENDER_ATTEMPTS = 3
+
+REPORT_PERIODS = ("month", "year")
+REPORT_FORMATS = {"csv": "text/csv", "html": "text/html"}
+ACTIVE_STATUSES = ("pending", "running")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+class ReportQueueFull(Exception):
+    """В очереди уже REPORT_MAX_PENDING заданий"""
+
+
+# ==================== ПЕРИОДЫ И КЭШ ====================
+
+def period_bounds(period: str, year: int, month: Optional[int] = None) -> Tuple[datetime, datetime]:
+    """Границы периода [start, end)"""
+    if period == "year":
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    if month == 12:
+        return datetime(year, 12, 1), datetime(year + 1, 1, 1)
+    return datetime(year, month, 1), datetime(year, month + 1, 1)
+
+
+def period_key(period: str, year: int, month: Optional[int] = None) -> str:
+    return f"{year}" if period == "year" else f"{year}-{month:02d}"
+
+
+def _period_end(key: str) -> Optional[datetime]:
+    """Конец периода по ключу из period_key (None — не ключ периода)"""
+    try:
+        if len(key) == 4:
+            return period_bounds("year", int(key))[1]
+        year, month = key.split("-")
+        return period_bounds("month", int(year), int(month))[1]
+    except ValueError:
+        return None
+
+
+def is_closed(period: str, year: int, month: Optional[int] = None) -> bool:
+    """Период закончился, и его выписка больше не меняется сама по себе"""
+    _, end = period_bounds(period, year, month)
+    return end <= datetime.now()
+
+
+def cached_path(period: str, year: int, month: Optional[int], format: str) -> str:
+    return os.path.join(REPORTS_DIR, f"{period_key(period, year, month)}.{format}")
+
+
+def own_job_path(job: models.ReportJob) -> str:
+    return os.path.join(REPORTS_DIR, "jobs", f"{job.id}.{job.format}")
+
+
+def cleanup_job_artifacts() -> None:
+    """Удалить файлы отдельных заданий старше REPORT_JOB_RETENTION_HOURS"""
+    jobs_dir = os.path.join(REPORTS_DIR, "jobs")
+    if not os.path.isdir(jobs_dir):
+        return
+    expire_before = time.time() - REPORT_JOB_RETENTION_HOURS * 3600
+    for name in os.listdir(jobs_dir):
+        path = os.path.join(jobs_dir, name)
+        try:
+            if os.path.getmtime(path) < expire_before:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def job_path(job: models.ReportJob) -> str:
+    """Файл результата: общий для закрытых периодов, отдельный для текущих"""
+    if is_closed(job.period, job.year, job.month):
+        return cached_path(job.period, job.year, job.month, job.format)
+    return own_job_path(job)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def invalidate_cached(moment: Optional[datetime]) -> None:
+    """
+    Удалить закэшированные выписки за все периоды, которые заканчиваются
+    после moment: транзакция попадает в них или в их входящий остаток.
+
+    Вызывается после commit изменения (см. app.crud.tracking).
+    """
+    if moment is None or not os.path.isdir(REPORTS_DIR):
+        return
+    for name in os.listdir(REPORTS_DIR):
+        key, _, format = name.partition(".")
+        if format not in REPORT_FORMATS:
+            continue
+        end = _period_end(key)
+        if end is not None and end > moment:
+            _remove(os.path.join(REPORTS_DIR, name))
+
+
+# ==================== РЕНДЕРИНГ (в процессе-воркере) ====================
+
+def _init_worker() -> None:
+    try:
+        os.nice(REPORT_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+def _signed_amount():
+    return case(
+        (models.Transaction.type == "income", models.Transaction.amount),
+        (models.Transaction.type == "expense", -models.Transaction.amount),
+        else_=0
+    )
+
+
+def _stream_rows(db, start: datetime, end: datetime, opening_balance: float):
+    """Транзакции периода по порядку с нарастающим балансом"""
+    rows = db.query(
+        models.Transaction.id,
+        models.Transaction.created_at,
+        models.Transaction.type,
+        models.Transaction.amount,
+        models.Transaction.description,
+        models.Category.name
+    ).outerjoin(
+        models.Category,
+        models.Category.id == models.Transaction.category_id
+    ).filter(
+        and_(
+            models.Transaction.created_at >= start,
+            models.Transaction.created_at < end
+        )
+    ).order_by(
+        models.Transaction.created_at,
+        models.Transaction.id
+    ).yield_per(1000)
+
+    balance = opening_balance
+    for transaction_id, created_at, type, amount, description, category in rows:
+        if type == "income":
+            balance += amount
+        elif type == "expense":
+            balance -= amount
+        yield {
+            "id": transaction_id,
+            "created_at": created_at,
+            "type": type,
+            "amount": amount,
+            "description": description or "",
+            "category": category or "",
+            "balance": balance,
+        }
+
+
+def _render(db, job: models.ReportJob, path: str) -> None:
+    start, end = period_bounds(job.period, job.year, job.month)
+
+    opening_balance = db.query(func.sum(_signed_amount())).filter(
+        models.Transaction.created_at < start
+    ).scalar() or 0
+
+    rows = _stream_rows(db, start, end, float(opening_balance))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        _write(db, job, rows, start, end, float(opening_balance), tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+
+
+def _write(db, job: models.ReportJob, rows, start: datetime, end: datetime,
+           opening_balance: float, tmp_path: str) -> None:
+    with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+        if job.format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(["id", "date", "type", "category", "description", "amount", "balance"])
+            for row in rows:
+                writer.writerow([
+                    row["id"], row["created_at"].isoformat(), row["type"], row["category"],
+                    row["description"], f"{row['amount']:.2f}", f"{row['balance']:.2f}"
+                ])
+        else:
+            breakdown = db.query(
+                func.coalesce(models.Category.name, "—"),
+                models.Transaction.type,
+                func.sum(models.Transaction.amount),
+                func.count(models.Transaction.id)
+            ).outerjoin(
+                models.Category,
+                models.Category.id == models.Transaction.category_id
+            ).filter(
+                and_(
+                    models.Transaction.created_at >= start,
+                    models.Transaction.created_at < end
+                )
+            ).group_by(
+                models.Category.name,
+                models.Transaction.type
+            ).order_by(func.sum(models.Transaction.amount).desc()).all()
+
+            templates = Jinja2Templates(directory=TEMPLATES_DIR)
+            stream = templates.get_template("report.html").generate(
+                title=f"Выписка за {period_key(job.period, job.year, job.month)}",
+                start=start,
+                end=end,
+                opening_balance=opening_balance,
+                breakdown=breakdown,
+                rows=rows,
+                generated_at=datetime.now()
+            )
+            for chunk in stream:
+                out.write(chunk)
+
+
+def _render_cached(db, job: models.ReportJob, path: str) -> str:
+    """
+    Отрендерить выписку закрытого периода в общий кэш.
+
+    Версия данных сверяется уже после записи файла: если транзакции
+    изменились во время рендеринга, файл мог устареть и рендерится заново.
+    Если же изменение закоммичено после проверки, его invalidate_cached
+    удалит уже записанный файл. Возвращает путь к результату.
+    """
+    for _ in range(REPORT_RENDER_ATTEMPTS):
+        version = TransactionCountCRUD.data_version(db)
+        _render(db, job, path)
+        db.commit()  # новый снимок БД для проверки версии
+        if TransactionCountCRUD.data_version(db) == version:
+            return path
+        _remove(path)
+
+    # Транзакции меняются непрерывно — отдаем результат только этому заданию
+    path = own_job_path(job)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _render(db, job, path)
+    return path
+
+
+def run_report_job(job_id: int) -> None:
+    """Точка входа процесса-воркера: отрендерить отчет и обновить статус задания"""
+    db = SessionLocal()
+    try:
+        job = db.get(models.ReportJob, job_id)
+        job.status = "running"
+        db.commit()
+
+        try:
+            path = job_path(job)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not is_closed(job.period, job.year, job.month):
+                _render(db, job, path)
+            elif not os.path.exists(path):
+                path = _render_cached(db, job, path)
+            job.status = "done"
+            job.artifact_path = path
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+
+        job.finished_at = datetime.now()
+        db.commit()
+    finally:
+        db.close()
+
+
+# ==================== ОЧЕРЕДЬ (в процессе API) ====================
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+    return _executor
+
+
+def ensure_capacity(db) -> None:
+    """
+    Проверить, что в очереди есть место (до создания задания).
+
+    Считаются незавершенные задания в БД, поэтому лимит общий для всех
+    процессов API и сохраняется после перезапуска.
+    """
+    active = db.query(func.count(models.ReportJob.id)).filter(
+        models.ReportJob.status.in_(ACTIVE_STATUSES)
+    ).scalar()
+    if active >= REPORT_MAX_PENDING:
+        raise ReportQueueFull()
+
+
+def submit_report(job_id: int) -> None:
+    """Поставить задание в пул процессов"""
+    global _executor
+    with _lock:
+        try:
+            future = _get_executor().submit(run_report_job, job_id)
+        except BrokenProcessPool:
+            # Воркер упал (например, OOM) — пересоздаем пул
+            _executor = None
+            future = _get_executor().submit(run_report_job, job_id)
+    future.add_done_callback(partial(_on_done, job_id))
+
+
+def _fail_job(job_id: int, error: str) -> None:
+    """Пометить задание failed, если оно так и не завершилось"""
+    db = SessionLocal()
+    try:
+        db.query(models.ReportJob).filter(
+            models.ReportJob.id == job_id,
+            models.ReportJob.status.in_(ACTIVE_STATUSES)
+        ).update(
+            {
+                models.ReportJob.status: "failed",
+                models.ReportJob.error: error,
+                models.ReportJob.finished_at: datetime.now()
+            },
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _on_done(job_id: int, future) -> None:
+    # Если процесс-воркер умер или задание отменено при остановке,
+    # run_report_job не успел обновить статус — иначе клиент ждал бы вечно
+    if future.cancelled():
+        error = "Задание отменено при остановке сервера"
+    elif future.exception() is not None:
+        error = f"Ошибка воркера отчетов: {future.exception()!r}"
+    else:
+        return
+
+    print(f"⚠️ Отчет {job_id}: {error}")
+    try:
+        _fail_job(job_id, error)
+    except Exception as e:
+        print(f"⚠️ Не удалось обновить статус отчета {job_id}: {e}")
+
+
+def recover_jobs() -> None:
+    """
+    Вернуть в очередь задания, оставшиеся pending/running после остановки
+    или падения процесса API (вызывается при старте).
+
+    Каждое задание забирает один процесс атомарным UPDATE по attempts.
+    Задание другого живого процесса может отрендериться повторно — это
+    безопасно, файл заменяется атомарно. После REPORT_MAX_ATTEMPTS
+    задание помечается failed.
+    """
+    db = SessionLocal()
+    try:
+        leftovers = db.query(
+            models.ReportJob.id,
+            models.ReportJob.attempts
+        ).filter(models.ReportJob.status.in_(ACTIVE_STATUSES)).all()
+
+        claimed = []
+        for job_id, attempts in leftovers:
+            claim = db.query(models.ReportJob).filter(
+                models.ReportJob.id == job_id,
+                models.ReportJob.attempts == attempts,
+                models.ReportJob.status.in_(ACTIVE_STATUSES)
+            )
+            if attempts + 1 >= REPORT_MAX_ATTEMPTS:
+                claim.update(
+                    {
+                        models.ReportJob.status: "failed",
+                        models.ReportJob.error: "Задание не завершилось после перезапусков",
+                        models.ReportJob.finished_at: datetime.now()
+                    },
+                    synchronize_session=False
+                )
+            elif claim.update(
+                {
+                    models.ReportJob.status: "pending",
+                    models.ReportJob.attempts: attempts + 1
+                },
+                synchronize_session=False
+            ):
+                claimed.append(job_id)
+        db.commit()
+    finally:
+        db.close()
+
+    for job_id in claimed:
+        submit_report(job_id)
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
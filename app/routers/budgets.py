@@ -0,0 +1,134 @@
+# app/routers/budgets.py
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import get_db
+from app.crud.budget import BudgetCRUD, BUDGET_PERIODS
+
+router = APIRouter(prefix="/api/v1/budgets", tags=["budgets"])
+
+
+def _validate_budget(db: Session, budget: models.Budget) -> None:
+    """Проверить итоговые поля бюджета (после применения изменений)"""
+    if budget.period not in BUDGET_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Период должен быть одним из: {', '.join(BUDGET_PERIODS)}"
+        )
+
+    if budget.amount is None or budget.amount <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Лимит бюджета должен быть больше 0"
+        )
+
+    if budget.period == "custom" and (
+        not budget.start_date or not budget.end_date or budget.start_date > budget.end_date
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Для периода 'custom' нужны start_date <= end_date"
+        )
+
+    category = db.query(models.Category).filter(
+        models.Category.id == budget.category_id
+    ).first()
+
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Категория с ID {budget.category_id} не найдена"
+        )
+
+
+def _get_budget_or_404(db: Session, budget_id: int) -> models.Budget:
+    budget = BudgetCRUD.get_budget(db, budget_id)
+
+    if not budget:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Бюджет с ID {budget_id} не найден"
+        )
+
+    return budget
+
+
+@router.get("/", response_model=List[schemas.BudgetResponse])
+def get_budgets(
+    skip: int = Query(0, ge=0, description="Number of items to skip"),
+    limit: int = Query(100, ge=1, le=100, description="Number of items to return"),
+    db: Session = Depends(get_db)
+):
+    """Получить список бюджетов."""
+    return BudgetCRUD.get_budgets(db, skip=skip, limit=limit)
+
+
+@router.post("/",
+    response_model=schemas.BudgetResponse,
+    status_code=status.HTTP_201_CREATED
+)
+def create_budget(budget: schemas.BudgetCreate, db: Session = Depends(get_db)):
+    """
+    Создать бюджет для категории.
+
+    Поля:
+    - **category_id**: ID категории
+    - **amount**: Лимит на период
+    - **period**: month, week или custom
+    - **start_date**, **end_date**: Границы периода (только для custom)
+    """
+    _validate_budget(db, models.Budget(**budget.dict()))
+    return BudgetCRUD.create_budget(db, budget)
+
+
+@router.get("/status", response_model=List[schemas.BudgetStatus])
+def get_budgets_status(db: Session = Depends(get_db)):
+    """
+    Текущее использование всех бюджетов.
+
+    Расходы берутся из счетчиков одним запросом, без SUM по транзакциям.
+    """
+    return BudgetCRUD.get_status(db)
+
+
+@router.post("/rebuild")
+def rebuild_budget_counters(db: Session = Depends(get_db)):
+    """
+    Пересчитать счетчики расходов всех бюджетов.
+
+    Нужен после массового импорта транзакций в обход API.
+    """
+    counters = BudgetCRUD.rebuild_counters(db)
+    db.commit()
+    return {"message": "Budget counters rebuilt", "counters": counters}
+
+
+@router.get("/{budget_id}", response_model=schemas.BudgetResponse)
+def get_budget(budget_id: int, db: Session = Depends(get_db)):
+    """Получить бюджет по ID."""
+    return _get_budget_or_404(db, budget_id)
+
+
+@router.put("/{budget_id}", response_model=schemas.BudgetResponse)
+def update_budget(
+    budget_id: int,
+    budget_update: schemas.BudgetUpdate,
+    db: Session = Depends(get_db)
+):
+    """Обновить бюджет."""
+    budget = _get_budget_or_404(db, budget_id)
+
+    merged = {field: getattr(budget, field) for field in schemas.BudgetCreate.model_fields}
+    merged.update(budget_update.dict(exclude_unset=True))
+    _validate_budget(db, models.Budget(**merged))
+
+    return BudgetCRUD.update_budget(db, budget, budget_update)
+
+
+@router.delete("/{budget_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_budget(budget_id: int, db: Session = Depends(get_db)):
+    """Удалить бюджет."""
+    budget = _get_budget_or_404(db, budget_id)
+    BudgetCRUD.delete_budget(db, budget)
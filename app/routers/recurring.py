@@ -0,0 +1,210 @@
+# app/routers/recurring.py
+from typing import Optional, List
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import get_db
+from app.crud.counts import TRANSACTION_TYPES
+from app.crud.recurring import RecurringCRUD, FREQUENCIES, TooManyOccurrences
+from app.dates import to_local_naive
+
+router = APIRouter(prefix="/api/v1/recurring", tags=["recurring"])
+
+
+def _validate_rule(db: Session, rule: models.RecurringRule) -> None:
+    """Проверить итоговые поля правила (после применения изменений)"""
+    if rule.frequency not in FREQUENCIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Частота должна быть одной из: {', '.join(FREQUENCIES)}"
+        )
+
+    if rule.amount is None or rule.start_date is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="amount и start_date не могут быть пустыми"
+        )
+
+    if rule.type not in TRANSACTION_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Тип должен быть income или expense"
+        )
+
+    if not rule.interval or rule.interval < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Интервал должен быть не меньше 1"
+        )
+
+    if rule.count is not None and rule.count < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="count должен быть не меньше 1"
+        )
+
+    if rule.until is not None and rule.until < rule.start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="until не может быть раньше start_date"
+        )
+
+    if rule.category_id:
+        category = db.query(models.Category).filter(
+            models.Category.id == rule.category_id
+        ).first()
+
+        if not category:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Категория с ID {rule.category_id} не найдена"
+            )
+
+
+def _get_rule_or_404(db: Session, rule_id: int) -> models.RecurringRule:
+    rule = RecurringCRUD.get_rule(db, rule_id)
+
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Правило с ID {rule_id} не найдено"
+        )
+
+    return rule
+
+
+def _ensure_pending_occurrence(db: Session, rule: models.RecurringRule, moment: datetime) -> None:
+    """Убедиться, что дата — вхождение правила и оно еще не подтверждено/пропущено"""
+    if not RecurringCRUD.is_occurrence(rule, moment):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{moment.isoformat()} не является датой вхождения правила {rule.id}"
+        )
+
+    if RecurringCRUD.is_resolved(db, rule.id, moment):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Вхождение {moment.isoformat()} уже подтверждено или пропущено"
+        )
+
+
+@router.get("/", response_model=List[schemas.RecurringRuleResponse])
+def get_rules(
+    skip: int = Query(0, ge=0, description="Number of items to skip"),
+    limit: int = Query(100, ge=1, le=100, description="Number of items to return"),
+    db: Session = Depends(get_db)
+):
+    """Получить список правил повторяющихся транзакций."""
+    return RecurringCRUD.get_rules(db, skip=skip, limit=limit)
+
+
+@router.post("/",
+    response_model=schemas.RecurringRuleResponse,
+    status_code=status.HTTP_201_CREATED
+)
+def create_rule(rule: schemas.RecurringRuleCreate, db: Session = Depends(get_db)):
+    """
+    Создать правило повторяющейся транзакции.
+
+    Поля:
+    - **amount**, **description**, **type**, **category_id**: Как у транзакции
+    - **frequency**: daily, weekly, monthly или yearly
+    - **interval**: Каждые N периодов (по умолчанию 1)
+    - **start_date**: Дата первого вхождения
+    - **until**, **count**: Ограничение по дате и/или количеству (опционально)
+
+    Вхождения не сохраняются в БД, а разворачиваются на лету для запрошенного окна.
+    """
+    _validate_rule(db, models.RecurringRule(**rule.dict()))
+    return RecurringCRUD.create_rule(db, rule)
+
+
+@router.get("/{rule_id}", response_model=schemas.RecurringRuleResponse)
+def get_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Получить правило по ID."""
+    return _get_rule_or_404(db, rule_id)
+
+
+@router.put("/{rule_id}", response_model=schemas.RecurringRuleResponse)
+def update_rule(
+    rule_id: int,
+    rule_update: schemas.RecurringRuleUpdate,
+    db: Session = Depends(get_db)
+):
+    """Обновить правило. Уже подтвержденные транзакции не меняются."""
+    rule = _get_rule_or_404(db, rule_id)
+
+    merged = {field: getattr(rule, field) for field in schemas.RecurringRuleCreate.model_fields}
+    merged.update(rule_update.dict(exclude_unset=True))
+    _validate_rule(db, models.RecurringRule(**merged))
+
+    return RecurringCRUD.update_rule(db, rule, rule_update)
+
+
+@router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Удалить правило. Подтвержденные транзакции остаются."""
+    rule = _get_rule_or_404(db, rule_id)
+    RecurringCRUD.delete_rule(db, rule)
+
+
+@router.get("/{rule_id}/occurrences", response_model=List[schemas.RecurringOccurrenceResponse])
+def get_rule_occurrences(
+    rule_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Вхождения правила в окне (по умолчанию — ближайшие 90 дней).
+
+    Статус: pending, confirmed или skipped.
+    """
+    rule = _get_rule_or_404(db, rule_id)
+
+    start_date = to_local_naive(start_date) or datetime.now()
+    end_date = to_local_naive(end_date) or start_date + timedelta(days=90)
+
+    try:
+        return RecurringCRUD.get_occurrences(db, start_date, end_date, rule_id=rule.id)
+    except TooManyOccurrences:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Слишком много вхождений в окне, сузьте start_date/end_date"
+        )
+
+
+@router.post("/{rule_id}/occurrences/confirm",
+    response_model=schemas.TransactionWriteResponse,
+    status_code=status.HTTP_201_CREATED
+)
+def confirm_occurrence(
+    rule_id: int,
+    confirm: schemas.OccurrenceConfirm,
+    db: Session = Depends(get_db)
+):
+    """
+    Подтвердить вхождение: создать по нему настоящую транзакцию.
+
+    amount, description и category_id можно переопределить для этого вхождения.
+    """
+    rule = _get_rule_or_404(db, rule_id)
+    _ensure_pending_occurrence(db, rule, confirm.occurrence_date)
+
+    db_transaction, flags = RecurringCRUD.confirm_occurrence(db, rule, confirm)
+    return schemas.TransactionWriteResponse.model_validate(db_transaction).model_copy(update=flags)
+
+
+@router.post("/{rule_id}/occurrences/skip", status_code=status.HTTP_204_NO_CONTENT)
+def skip_occurrence(
+    rule_id: int,
+    skip: schemas.OccurrenceSkip,
+    db: Session = Depends(get_db)
+):
+    """Пропустить вхождение: оно больше не показывается и не учитывается в статистике."""
+    rule = _get_rule_or_404(db, rule_id)
+    _ensure_pending_occurrence(db, rule, skip.occurrence_date)
+
+    RecurringCRUD.skip_occurrence(db, rule, skip.occurrence_date)
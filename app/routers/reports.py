@@ -0,0 +1,127 @@
+# app/routers/reports.py
+import os
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+from app import models, schemas, reports
+from app.database import get_db
+
+router = APIRouter(prefix="/api/v1/reports", tags=["reports"])
+
+
+def _validate_report(report: schemas.ReportCreate) -> None:
+    if report.period not in reports.REPORT_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Период должен быть одним из: {', '.join(reports.REPORT_PERIODS)}"
+        )
+
+    if report.format not in reports.REPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Формат должен быть одним из: {', '.join(reports.REPORT_FORMATS)}"
+        )
+
+    if report.period == "month" and (report.month is None or not 1 <= report.month <= 12):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Для периода 'month' нужен month от 1 до 12"
+        )
+
+    if not 1970 <= report.year <= 9998:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный год"
+        )
+
+
+@router.post("/",
+    response_model=schemas.ReportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def create_report(
+    report: schemas.ReportCreate,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """
+    Поставить в очередь выписку за месяц или год.
+
+    Поля:
+    - **period**: month или year
+    - **year**, **month**: Период выписки
+    - **format**: csv или html (для печати)
+
+    Статус и результат — GET /api/v1/reports/{id}. Если выписка уже
+    есть в кэше, задание сразу возвращается со статусом done и кодом 200.
+    """
+    _validate_report(report)
+    if report.period == "year":
+        report.month = None
+
+    job = models.ReportJob(**report.dict())
+
+    # Выписка за закрытый период уже есть на диске — отдаем без рендеринга
+    path = reports.cached_path(report.period, report.year, report.month, report.format)
+    if reports.is_closed(report.period, report.year, report.month) and os.path.exists(path):
+        job.status = "done"
+        job.artifact_path = path
+        job.finished_at = datetime.now()
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        response.status_code = status.HTTP_200_OK
+        return job
+
+    reports.cleanup_job_artifacts()
+
+    try:
+        reports.ensure_capacity(db)
+    except reports.ReportQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Очередь отчетов заполнена, попробуйте позже"
+        )
+
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    reports.submit_report(job.id)
+    return job
+
+
+@router.get("/{report_id}", response_model=schemas.ReportJobResponse)
+def get_report(report_id: int, db: Session = Depends(get_db)):
+    """
+    Статус задания, а когда отчет готов — сам файл.
+
+    Пока отчет генерируется, возвращается 202 со статусом.
+    """
+    job = db.query(models.ReportJob).filter(models.ReportJob.id == report_id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Отчет с ID {report_id} не найден"
+        )
+
+    if job.status == "done":
+        if not job.artifact_path or not os.path.exists(job.artifact_path):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Файл отчета удален (устарел или истек срок хранения), запросите его заново"
+            )
+        return FileResponse(
+            job.artifact_path,
+            media_type=reports.REPORT_FORMATS[job.format],
+            filename=f"moontracker-{reports.period_key(job.period, job.year, job.month)}.{job.format}"
+        )
+
+    content = jsonable_encoder(schemas.ReportJobResponse.model_validate(job))
+    if job.status in ("pending", "running"):
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=content)
+    return JSONResponse(content=content)
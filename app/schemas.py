@@ -1,6 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional
-from datetime import datetime
+from typing_extensions import TypedDict
+from datetime import datetime, date
+
+from app.dates import to_local_naive
 
 # Категория
 class CategoryBase(BaseModel):
@@ -27,9 +30,162 @@ class TransactionBase(BaseModel):
 class TransactionCreate(TransactionBase):
     pass
 
+class TransactionUpdate(BaseModel):
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    type: Optional[str] = None
+    category_id: Optional[int] = None
+
 class TransactionResponse(TransactionBase):
     id: int
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Ответ на создание/изменение транзакции
+class TransactionWriteResponse(TransactionResponse):
+    over_budget: bool = False
+    anomaly_score: Optional[float] = None  # z-score суммы внутри категории
+
+class OutlierResponse(TransactionResponse):
+    anomaly_score: float
+    typical_amount: Optional[float] = None
+
+# Строка транзакции для быстрой сериализации (без создания модели на строку)
+class TransactionRow(TypedDict):
+    amount: float
+    description: Optional[str]
+    type: str
+    category_id: Optional[int]
+    id: int
+    created_at: datetime
+
+# Вхождение повторяющейся транзакции в списке (id пуст, пока не подтверждено)
+class TransactionOccurrenceRow(TypedDict):
+    amount: float
+    description: Optional[str]
+    type: str
+    category_id: Optional[int]
+    id: Optional[int]
+    created_at: datetime
+    recurring_rule_id: Optional[int]
+
+# Бюджет
+class BudgetBase(BaseModel):
+    category_id: int
+    amount: float  # лимит на период
+    period: str = "month"  # 'month', 'week' или 'custom'
+    start_date: Optional[date] = None  # только для 'custom'
+    end_date: Optional[date] = None
+
+class BudgetCreate(BudgetBase):
+    pass
+
+class BudgetUpdate(BaseModel):
+    category_id: Optional[int] = None
+    amount: Optional[float] = None
+    period: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class BudgetResponse(BudgetBase):
+    id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class BudgetStatus(BaseModel):
+    budget_id: int
+    category_id: int
+    period: str
+    period_start: Optional[date]
+    period_end: Optional[date]
+    amount: float
+    spent: float
+    remaining: float
+    utilization: float  # spent / amount
+    over_budget: bool
+
+# Повторяющаяся транзакция
+class RecurringRuleBase(BaseModel):
+    amount: float
+    description: Optional[str] = None
+    type: str  # 'income' или 'expense'
+    category_id: Optional[int] = None
+    frequency: str = "monthly"  # 'daily', 'weekly', 'monthly' или 'yearly'
+    interval: int = 1
+    start_date: datetime
+    until: Optional[datetime] = None
+    count: Optional[int] = None
+
+    _local_dates = field_validator("start_date", "until")(to_local_naive)
+
+class RecurringRuleCreate(RecurringRuleBase):
+    pass
+
+class RecurringRuleUpdate(BaseModel):
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    type: Optional[str] = None
+    category_id: Optional[int] = None
+    frequency: Optional[str] = None
+    interval: Optional[int] = None
+    start_date: Optional[datetime] = None
+    until: Optional[datetime] = None
+    count: Optional[int] = None
+
+    _local_dates = field_validator("start_date", "until")(to_local_naive)
+
+class RecurringRuleResponse(RecurringRuleBase):
+    id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class OccurrenceConfirm(BaseModel):
+    occurrence_date: datetime
+    # Переопределения для конкретного вхождения (опционально)
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    category_id: Optional[int] = None
+
+    _local_dates = field_validator("occurrence_date")(to_local_naive)
+
+class OccurrenceSkip(BaseModel):
+    occurrence_date: datetime
+
+    _local_dates = field_validator("occurrence_date")(to_local_naive)
+
+class RecurringOccurrenceResponse(BaseModel):
+    rule_id: int
+    occurrence_date: datetime
+    amount: float
+    description: Optional[str]
+    type: str
+    category_id: Optional[int]
+    status: str  # 'pending', 'confirmed' или 'skipped'
+    transaction_id: Optional[int] = None
+
+# Отчет (выписка)
+class ReportCreate(BaseModel):
+    period: str = "month"  # 'month' или 'year'
+    year: int
+    month: Optional[int] = None  # только для 'month'
+    format: str = "csv"  # 'csv' или 'html'
+
+class ReportJobResponse(BaseModel):
+    id: int
+    period: str
+    year: int
+    month: Optional[int]
+    format: str
+    status: str  # 'pending', 'running', 'done' или 'failed'
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
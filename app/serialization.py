@@ -0,0 +1,50 @@
+# app/serialization.py
+"""
+Быстрая сериализация списков транзакций.
+
+Обычный путь FastAPI (response_model=List[...]) создает Pydantic-модель
+на каждую ORM-строку и кодирует результат стандартным json. Здесь строки
+выбираются кортежами и сразу превращаются в JSON-байты: через orjson,
+если он установлен, иначе через заранее скомпилированный TypeAdapter.
+"""
+from typing import Iterable, List, Sequence
+
+from pydantic import TypeAdapter
+
+from app import schemas
+
+try:
+    import orjson
+except ImportError:  # orjson опционален
+    orjson = None
+
+# Порядок полей совпадает с порядком в schemas.TransactionResponse,
+# чтобы быстрый и обычный ответы совпадали.
+TRANSACTION_FIELDS = ("amount", "description", "type", "category_id", "id", "created_at")
+
+transaction_rows_adapter = TypeAdapter(List[schemas.TransactionRow])
+occurrence_rows_adapter = TypeAdapter(List[schemas.TransactionOccurrenceRow])
+
+
+def rows_to_dicts(rows: Iterable[Sequence], fields: Sequence[str] = TRANSACTION_FIELDS) -> List[dict]:
+    """Кортежи строк -> список словарей (без создания моделей)"""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def dump_transaction_rows(rows: Iterable[Sequence]) -> bytes:
+    """Сериализовать строки транзакций (кортежи в порядке TRANSACTION_FIELDS) в JSON"""
+    return dump_transaction_dicts(rows_to_dicts(rows))
+
+
+def dump_transaction_dicts(items: List[dict]) -> bytes:
+    """Сериализовать уже подготовленные словари транзакций в JSON"""
+    if orjson is not None:
+        return orjson.dumps(items)
+    return transaction_rows_adapter.dump_json(items)
+
+
+def dump_occurrence_dicts(items: List[dict]) -> bytes:
+    """Сериализовать транзакции вместе с вхождениями повторяющихся правил"""
+    if orjson is not None:
+        return orjson.dumps(items)
+    return occurrence_rows_adapter.dump_json(items)
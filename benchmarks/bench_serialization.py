@@ -0,0 +1,85 @@
+# benchmarks/bench_serialization.py
+"""
+Микробенчмарк сериализации списка транзакций.
+
+Сравнивает обычный путь FastAPI (валидация ORM-объектов через
+response_model с from_attributes + стандартный json) с быстрым путем
+из app.serialization (кортежи -> JSON-байты).
+
+Запуск:
+    python -m benchmarks.bench_serialization [--rows 100] [--repeat 200]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app import schemas, serialization
+
+response_adapter = TypeAdapter(List[schemas.TransactionResponse])
+
+
+def make_rows(count: int):
+    """Синтетические строки: ORM-подобные объекты и кортежи"""
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    objects, tuples = [], []
+    for i in range(count):
+        values = {
+            "amount": 100.0 + i * 1.25,
+            "description": f"Покупка #{i}",
+            "type": "expense" if i % 3 else "income",
+            "category_id": i % 7 or None,
+            "id": i + 1,
+            "created_at": start + timedelta(minutes=i),
+        }
+        objects.append(SimpleNamespace(**values))
+        tuples.append(tuple(values[field] for field in serialization.TRANSACTION_FIELDS))
+    return objects, tuples
+
+
+def baseline(objects) -> bytes:
+    """Так сериализует FastAPI при response_model=List[TransactionResponse]"""
+    validated = response_adapter.validate_python(objects, from_attributes=True)
+    content = response_adapter.dump_python(validated, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast(tuples) -> bytes:
+    return serialization.dump_transaction_rows(tuples)
+
+
+def measure(func, payload, rows: int, repeat: int) -> float:
+    func(payload)  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(payload)
+    elapsed = time.perf_counter() - started
+    return rows * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    objects, tuples = make_rows(args.rows)
+    assert json.loads(baseline(objects)) == json.loads(fast(tuples))
+
+    before = measure(baseline, objects, args.rows, args.repeat)
+    after = measure(fast, tuples, args.rows, args.repeat)
+    backend = "orjson" if serialization.orjson is not None else "TypeAdapter"
+
+    print(f"rows={args.rows} repeat={args.repeat} backend={backend}")
+    print(f"до:    {before:>12,.0f} строк/с")
+    print(f"после: {after:>12,.0f} строк/с  (x{after / before:.1f})")
+
+
+if __name__ == "__main__":
+    main()